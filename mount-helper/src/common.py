@@ -242,6 +242,7 @@ class MountHelperLogger:
     log_store = None
     log_file = None
     log_prefix = None
+    batch_handler = None
 
     def init_log_file(self):
         if not LocalInstall.exists():
@@ -264,6 +265,36 @@ class MountHelperLogger:
     def SetLogToFileEnabled(self):
         MountHelperLogger.use_log_file = True
 
+    # Wraps the file handler in a MemoryHandler so a burst of log calls
+    # (e.g. a sweep over many stale conf files) is flushed with one write
+    # instead of one write per record. Errors still flush immediately.
+    def EnableLogBatching(self, capacity=1024):
+        if MountHelperLogger.batch_handler:
+            return
+        if not MountHelperLogger.log_file and MountHelperLogger.use_log_file:
+            MountHelperLogger.log_file = self.init_log_file()
+        log_file = MountHelperLogger.log_file
+        if not log_file or not log_file.handlers:
+            return
+        target = log_file.handlers[0]
+        handler = logging.handlers.MemoryHandler(
+            capacity, flushLevel=logging.ERROR, target=target
+        )
+        log_file.removeHandler(target)
+        log_file.addHandler(handler)
+        MountHelperLogger.batch_handler = handler
+
+    def DisableLogBatching(self):
+        handler = MountHelperLogger.batch_handler
+        if not handler:
+            return
+        MountHelperLogger.batch_handler = None
+        log_file = MountHelperLogger.log_file
+        log_file.removeHandler(handler)
+        log_file.addHandler(handler.target)
+        # close() flushes anything still buffered into the target.
+        handler.close()
+
     def SetDebugEnabled(self):
         MountHelperLogger.debug_enabled = True
 
@@ -620,6 +651,10 @@ class NfsMount(MountHelperBase):
     PATH_INDEX = 1
     SOURCE_ARGS_LENGTH = 2
     MOUNT_LIST_NFS_CMD = ["mount", "-t nfs,nfs4"]
+    PROC_MOUNTS_PATH = "/proc/self/mounts"
+    PROC_FIELDS_SIZE = 4
+    PROC_MOUNTED_AT_INDEX = 1
+    PROC_FS_TYPE_INDEX = 2
 
     def __init__(self, ip=None, mount_path=None, mounted_at=None, mount_port=None):
         self.ip = ip
@@ -628,21 +663,46 @@ class NfsMount(MountHelperBase):
         self.mount_port = mount_port
 
     def load_nfs_mounts(self):
-        result = self.RunCmd(NfsMount.MOUNT_LIST_NFS_CMD, "ListNfsMounts")
-        if not result:
-            return []
+        # Read the proc mounts file directly so enumerating existing mounts
+        # does not fork the mount command. The command remains as a fallback
+        # for hosts without a proc filesystem.
+        if os.path.exists(NfsMount.PROC_MOUNTS_PATH):
+            data = self.ReadFile(NfsMount.PROC_MOUNTS_PATH, log=False)
+            lines = data.splitlines() if data else []
+            parse_line = self.get_nfs_mount_from_proc_line
+        else:
+            result = self.RunCmd(NfsMount.MOUNT_LIST_NFS_CMD, "ListNfsMounts")
+            if not result:
+                return []
+            lines = result.stdout.splitlines()
+            parse_line = self.get_nfs_mount
 
-        lines = result.stdout.splitlines()
         mounts = []
-        # Parse mount command output line by line and search for ip address and mount path.
+        # Parse line by line and search for ip address and mount path.
         for line in lines:
-            mount = self.get_nfs_mount(line)
+            mount = parse_line(line)
             if mount:
                 mounts.append(mount)
 
         self.LogDebug("Existing nfs/nfs4 mounts found:" + str(len(mounts)))
         return mounts
 
+    # Parse a "<src> <mount point> <fs type> <options> ..." proc mounts line.
+    def get_nfs_mount_from_proc_line(self, line):
+        fields = line.split(" ")
+        if len(fields) >= NfsMount.PROC_FIELDS_SIZE:
+            fs_type = fields[NfsMount.PROC_FS_TYPE_INDEX]
+            if fs_type in (NfsMount.MOUNT_TYPE_NFS, NfsMount.MOUNT_TYPE_NFS4):
+                ip, mount_path = NfsMount.extract_source(
+                    fields[NfsMount.NFS_PATH_INDEX]
+                )
+                port = self.get_mount_port(line)
+                if ip and mount_path:
+                    return NfsMount(
+                        ip, mount_path, fields[NfsMount.PROC_MOUNTED_AT_INDEX], port
+                    )
+        return None
+
     def get_nfs_mount(self, line):
         mount_fields = line.split(" ")
         if len(mount_fields) >= NfsMount.MOUNT_OUTPUT_FIELDS_SIZE:
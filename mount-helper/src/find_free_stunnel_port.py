@@ -21,6 +21,10 @@ class FindFreeSTunnelPort:
     def is_port_unused(self, host, port):
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                # Without SO_REUSEADDR a port lingering in TIME_WAIT fails
+                # the probe even though stunnel could bind it, forcing the
+                # scan through extra bind attempts.
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 s.bind((host, port))
                 return True
         except socket.error:
@@ -34,9 +38,11 @@ class FindFreeSTunnelPort:
                 return port
         return -1
 
+    # Returns a set: get_free_port tests membership for every candidate
+    # port, so lookups need to be O(1).
     def get_ports_from_conf_files(self, conf_dir=StunnelConfigGet.STUNNEL_DIR_NAME):
 
-        ports = []
+        ports = set()
         pattern = re.compile(
             # Sample: 127.0.0.1:10001
             rf"\s*{StunnelConfigGet.STUNNEL_ACCEPT}\s*=\s*((\d{{1,3}}\.){{3}}\d{{1,3}}):(\d+)"
@@ -55,7 +61,7 @@ class FindFreeSTunnelPort:
 
                         match = pattern.search(line)
                         if match:
-                            ports.append(int(match.group(3)))
+                            ports.add(int(match.group(3)))
                             break
 
         return ports
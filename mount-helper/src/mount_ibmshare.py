@@ -4,41 +4,96 @@
 # Project name: VPC File Storage Mount Helper
 # This project is licensed under the MIT License, see LICENSE file in the root directory.
 
-from args_handler import ArgsHandler
+from args_handler import ArgsHandler, AppRunType
 from common import *
 import file_lock
+import functools
 import os
+import platform
+import select
 import stat
 import signal
 import timer_handler
-import traceback
-from renew_certs import RenewCerts
-from config import LocalInstall, StrongSwanConfig
-import stunnel_config_create, find_free_stunnel_port
+import find_free_stunnel_port
 from stunnel_config_get import StunnelConfigGet
 
 LOOPBACK_ADDRESS = "127.0.0.1"
 MOUNT_PORT = 20049
 STUNNEL_COMMAND = "stunnel"
+STUNNEL_DIRS = ["/etc/stunnel", "/var/log/stunnel/"]
+# Dirs where stunnel command is found on various OS versions
+STUNNEL_EXTRA_PATH = "/usr/bin:/usr/sbin"
+
+
+# Copying the whole environment per mount just to prefix PATH is wasted
+# work; derive the stunnel environment once per process.
+@functools.lru_cache(maxsize=1)
+def _stunnel_env():
+    env = os.environ.copy()
+    env["PATH"] = f"{STUNNEL_EXTRA_PATH}:{env.get('PATH', ' ')}"
+    return env
+
+
+# The host directory layout does not change while we run; remember the
+# result so repeat checks cost no stat syscalls.
+@functools.lru_cache(maxsize=1)
+def _missing_stunnel_dirs():
+    return tuple(d for d in STUNNEL_DIRS if not os.path.isdir(d))
+
+
+_HAS_PIDFD = hasattr(os, "pidfd_open") and hasattr(signal, "pidfd_send_signal")
+_HAS_POSIX_SPAWN = hasattr(os, "posix_spawnp")
+
+
+# Certificate and IPsec support drag in the heaviest import chains (ssl,
+# urllib, the StrongSwan parsers); a plain stunnel mount never touches
+# them, so they are resolved on first use instead of at startup. In the
+# merged single-file build the classes already live in globals() and the
+# source modules do not exist, hence the fallback.
+def _lazy_class(module_name, class_name):
+    try:
+        module = __import__(module_name)
+        return getattr(module, class_name)
+    except (ImportError, AttributeError):
+        return globals()[class_name]
+
+
+# The machine architecture never changes at runtime, so look it up once
+# with a single uname(2) syscall instead of forking "uname -m" per call.
+@functools.lru_cache(maxsize=1)
+def _machine():
+    if hasattr(os, "uname"):
+        return os.uname().machine
+    return platform.machine()
 
 
 class MountIbmshare(MountHelperBase):
 
     DESIRED_DEFAULT_UMASK = 0o22
+    STUNNEL_EXIT_TIMEOUT_MS = 30 * 1000
+
+    # run() resolves its handler with one dict lookup per run type.
+    RUN_DISPATCH = {
+        AppRunType.SETUP: "app_setup",
+        AppRunType.TEARDOWN: "app_teardown",
+        AppRunType.RENEW: "run_renew",
+        AppRunType.MOUNT: "run_mount",
+    }
 
     def __init__(self):
         self.mounts = []
+        self._mounts_cache = None
+        self._mount_index = {}
+        self._renew_certs = None
+        self.stunnel_requested = False
         self.lockhandler = file_lock.LockHandler.mount_share_lock()
 
     def set_installed_stunnel(self):
-        stunnel_dirs = ["/etc/stunnel", "/var/log/stunnel/"]
-        errored = False
-        for directory in stunnel_dirs:
-            if not os.path.isdir(directory):
-                self.LogError(f"The directory '{directory}' does not exist.")
-                errored = True
-
-        if errored:
+        missing_dirs = _missing_stunnel_dirs()
+        for directory in missing_dirs:
+            self.LogError(f"The directory '{directory}' does not exist.")
+
+        if missing_dirs:
             self.LogError(
                 f"The Stunnel setup required for encryption in transit is missing."
             )
@@ -46,10 +101,10 @@ class MountIbmshare(MountHelperBase):
                 f"Please download mount helper and run  './install.sh --stunnel' to complete installation"
             )
 
-        return not errored
+        return not missing_dirs
 
     def set_installed_ipsec(self):
-        ss_obj = StrongSwanConfig()
+        ss_obj = _lazy_class("config", "StrongSwanConfig")()
         if ss_obj.set_version():
             LocalInstall.set_ipsec_mgr(ss_obj)
             return True
@@ -66,23 +121,13 @@ class MountIbmshare(MountHelperBase):
                 ipsec.remove_all_configs(unused=True)
                 if ipsec.setup():
                     cert_path = SysApp.argv(2)
-                    return RenewCerts().install_root_cert(cert_path)
+                    renew = _lazy_class("renew_certs", "RenewCerts")()
+                    return renew.install_root_cert(cert_path)
         self.LogError("Installation failed.", code=SysApp.ERR_APP_INSTALL)
         return False
 
     def is_ppc(self):
-        try:
-            answer = subprocess.run(
-                ["uname", "-m"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                check=True,
-            ).stdout.strip()
-            return answer.startswith("ppc")
-        except subprocess.CalledProcessError as e:
-            self.LogError(f"Cannot fetch architecture due to exception {e}")
-            return False
+        return _machine().startswith("ppc")
 
     def app_teardown(self):
         self.LogDebug("TearDown starting")
@@ -96,7 +141,14 @@ class MountIbmshare(MountHelperBase):
         return True
 
     def renew_certs(self):
-        return RenewCerts().renew_cert_cmd_line()
+        return self._renew().renew_cert_cmd_line()
+
+    # RenewCerts loads and parses certificate files on use; one instance
+    # serves both the mount flow and the CA alert check in the same run.
+    def _renew(self):
+        if self._renew_certs is None:
+            self._renew_certs = _lazy_class("renew_certs", "RenewCerts")()
+        return self._renew_certs
 
     def lock(self):
         return self.lockhandler.grab_blocking_lock()
@@ -104,14 +156,28 @@ class MountIbmshare(MountHelperBase):
     def unlock(self):
         return self.lockhandler.release_lock()
 
+    # The mount list is parsed once and reused for the lifetime of a single
+    # run(). cleanup_stale_conf checks every conf file against it, so one
+    # parse serves them all. Invalidated after any mount command runs.
+    def _get_mounts(self):
+        if self._mounts_cache is None:
+            self._mounts_cache = NfsMount().load_nfs_mounts()
+            self._mount_index = {
+                (mount.ip, mount.mount_path): mount for mount in self._mounts_cache
+            }
+        return self._mounts_cache
+
+    def _invalidate_mounts(self):
+        self._mounts_cache = None
+        self._mount_index = {}
+
     # Method to check whether nfs share is already mounted.
     def is_share_mounted(self, ip_address, mount_path, port=""):
-        self.mounts = NfsMount().load_nfs_mounts()
-        for mount in self.mounts:
-            if mount.ip == ip_address and mount.mount_path == mount_path:
-                if port == "" or port == mount.mount_port:
-                    return True
-        return False
+        self.mounts = self._get_mounts()
+        mount = self._mount_index.get((ip_address, mount_path))
+        if mount is None:
+            return False
+        return port == "" or port == mount.mount_port
 
     def configure_default_umask(self):
         # Need to call os.umask twice as the call returns previous seting of umask.
@@ -144,15 +210,26 @@ class MountIbmshare(MountHelperBase):
         self.LogDebug(f"Local port {port} will be used for setting up the next stunnel")
 
         pid_file_dir = StunnelConfigGet.get_pid_file_dir()
-        if not os.path.isdir(pid_file_dir):
+        # One stat answers both the exists and is-a-directory questions;
+        # makedirs only runs on the miss path.
+        try:
+            dir_stat = os.stat(pid_file_dir)
+        except FileNotFoundError:
             try:
                 os.makedirs(pid_file_dir, exist_ok=True)
+                dir_stat = os.stat(pid_file_dir)
             except OSError as ex:
                 self.LogError(
                     f'Attempt to create directory "{pid_file_dir}" resulted in an exception {ex}. Please fix and retry'
                 )
                 return False
 
+        if not stat.S_ISDIR(dir_stat.st_mode):
+            self.LogError(
+                f'"{pid_file_dir}" exists but is not a directory. Please fix and retry'
+            )
+            return False
+
         if not os.access(pid_file_dir, os.W_OK):
             self.LogError(
                 f'The directory "{pid_file_dir}" is not writable. Make it writable and retry'
@@ -174,13 +251,29 @@ class MountIbmshare(MountHelperBase):
 
     # Cleans up unused conf files. Should not throw exception .
     def cleanup_stale_conf(self, dirname=StunnelConfigGet.STUNNEL_DIR_NAME):
+        # Discovery first, teardown second: collect every stale conf in one
+        # pass over the directory, then issue the kills and removals as a
+        # batch instead of interleaving them with the parsing.
+        stale = []
+        # The sweep can log a couple of lines per stale conf; batch them
+        # so the log file sees one write instead of one per record.
+        self.EnableLogBatching()
+        try:
+            self._cleanup_stale_conf(dirname, stale)
+        finally:
+            self.DisableLogBatching()
+
+    def _cleanup_stale_conf(self, dirname, stale):
         # os.listdir always listed only one file in unit tests!!!
         for entity in os.scandir(dirname):
             filename = entity.name
+            # String checks first: they cost nothing, while is_file can
+            # stat. With follow_symlinks=False it reuses the d_type the
+            # readdir already supplied, so no extra syscall on Linux.
             if (
-                entity.is_file()
-                and filename.endswith(StunnelConfigGet.STUNNEL_CONF_EXT)
+                filename.endswith(StunnelConfigGet.STUNNEL_CONF_EXT)
                 and StunnelConfigGet.IBM_SHARE_SIG in filename
+                and entity.is_file(follow_symlinks=False)
             ):
                 full_file_name = entity.path
                 st = StunnelConfigGet()
@@ -195,30 +288,57 @@ class MountIbmshare(MountHelperBase):
                     # When NFS mounts two paths to the same share, it can prefer one of the two network paths.
                     # when that happens on sunnel, mount forces itself on one of the two stunnel accept ports.
                     if not mounted:
+                        stale.append(st)
 
-                        self.LogInfo(
-                            f"{full_file_name} has no mounts associated with it. Killing stunnel process"
-                        )
-                        self.kill_stunnel_pid(st)
-                        try:
-                            self.RemoveFile(full_file_name)
-                            self.LogInfo(f"{full_file_name} removed")
-                        except Exception as e:
-                            self.LogError(f"Removefile returned an exception:{e}")
+        for st in stale:
+            full_file_name = st.get_config_file()
+            self.LogInfo(
+                f"{full_file_name} has no mounts associated with it. Killing stunnel process"
+            )
+            self.kill_stunnel_pid(st)
+            try:
+                self.RemoveFile(full_file_name)
+                self.LogInfo(f"{full_file_name} removed")
+            except Exception as e:
+                self.LogError(f"Removefile returned an exception:{e}")
 
     def pid_from_file(self, pid_file):
         try:
-            with open(pid_file, "r") as file:
-                pid = int(file.readline().strip())
-                if pid > 0:
-                    return pid
+            # A pid file holds a handful of bytes; a single raw read(2)
+            # avoids building a buffered text reader per stale conf.
+            fd = os.open(pid_file, os.O_RDONLY | os.O_CLOEXEC)
+            try:
+                data = os.read(fd, 32)
+            finally:
+                os.close(fd)
+            pid = int(data.decode().strip())
+            if pid > 0:
+                return pid
         except Exception as e:
             self.LogWarn(
                 f"Could not get PID from file {pid_file} due to exception {e} . Continuing."
             )
-            pass
         return None
 
+    # Kill via a pidfd where available (Linux >= 5.1): the fd pins the
+    # process identity, so a recycled PID can never be signalled by
+    # mistake. Falls back to plain os.kill elsewhere.
+    def kill_pid_no_reuse(self, pid):
+        if _HAS_PIDFD:
+            try:
+                fd = os.pidfd_open(pid)
+            except OSError:
+                # Process already gone; os.kill raises the error the
+                # caller expects to log.
+                os.kill(pid, signal.SIGKILL)
+                return
+            try:
+                signal.pidfd_send_signal(fd, signal.SIGKILL)
+            finally:
+                os.close(fd)
+        else:
+            os.kill(pid, signal.SIGKILL)
+
     def kill_stunnel_pid(self, st):
         if not st.is_found():
             return False
@@ -228,7 +348,7 @@ class MountIbmshare(MountHelperBase):
                 pid = self.pid_from_file(pid_file)
                 try:
                     if pid:  # 0 targets process group. Must avoid.
-                        os.kill(pid, signal.SIGKILL)
+                        self.kill_pid_no_reuse(pid)
                 except Exception as e:
                     self.LogWarn(
                         f"Method kill_stunnel_pid failed with exception {e}. Continuing."
@@ -244,7 +364,7 @@ class MountIbmshare(MountHelperBase):
     # Create conf file and start stunnel.
     def start_stunnel(self, port, ip_address, mount_path):
         self.LogDebug(f"Starting stunnel for mounting {mount_path}")
-        st = stunnel_config_create.StunnelConfigCreate(
+        st = _lazy_class("stunnel_config_create", "StunnelConfigCreate")(
             accept_ip=LOOPBACK_ADDRESS,
             accept_port=port,
             connect_ip=ip_address,
@@ -259,29 +379,82 @@ class MountIbmshare(MountHelperBase):
             conf_file = st.get_config_file()
             self.LogDebug(f"Stunnel conf file created {conf_file}")
             try:
-                current_path = os.environ.get("PATH", " ")
-                # Dirs where stunnel command is found on various OS versions
-                additional_path = "/usr/bin:/usr/sbin"
-                new_path = f"{additional_path}:{current_path}"
-                env_copy = os.environ.copy()
-                env_copy["PATH"] = new_path
                 self.LogDebug(f"Attempting to start stunnel using {conf_file}")
-                result = subprocess.run(
-                    [STUNNEL_COMMAND, conf_file],
-                    check=False,
-                    env=env_copy,
-                    stderr=subprocess.PIPE,
-                )
-                if result.returncode != 0:
+                returncode, stderr = self.launch_stunnel(conf_file)
+                if returncode != 0:
                     self.LogError(
-                        f'''Stunnel start returned error "{result.stderr.decode('utf-8')}"'''
+                        f'''Stunnel start returned error "{stderr.decode('utf-8')}"'''
                     )
                     return False
-            except subprocess.CalledProcessError as cpe:
+            except (OSError, subprocess.SubprocessError) as cpe:
                 self.LogError(f"Stunnel start returned exception {cpe}")
                 return False
         return True
 
+    # Spawn the stunnel launcher and collect (returncode, stderr bytes).
+    # os.posix_spawnp avoids the fork inside subprocess, which copies this
+    # process's page tables before exec; the spawned child writes stderr
+    # into a pipe via the dup2 file action. Falls back to Popen where
+    # posix_spawnp does not exist.
+    def launch_stunnel(self, conf_file):
+        if not _HAS_POSIX_SPAWN:
+            proc = subprocess.Popen(
+                [STUNNEL_COMMAND, conf_file],
+                env=_stunnel_env(),
+                stderr=subprocess.PIPE,
+            )
+            return self.wait_stunnel_exit(proc)
+
+        read_fd, write_fd = os.pipe()
+        try:
+            pid = os.posix_spawnp(
+                STUNNEL_COMMAND,
+                [STUNNEL_COMMAND, conf_file],
+                _stunnel_env(),
+                file_actions=[
+                    (os.POSIX_SPAWN_DUP2, write_fd, 2),
+                    (os.POSIX_SPAWN_CLOSE, read_fd),
+                ],
+            )
+        except OSError:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+
+        self.wait_pid_exit(pid)
+        stderr = b""
+        while True:
+            chunk = os.read(read_fd, 4096)
+            if not chunk:
+                break
+            stderr += chunk
+        os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+        returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+        return returncode, stderr
+
+    # Block until the given pid exits. On Linux >= 5.3 a pidfd lets poll
+    # wake us exactly when the process exits, instead of the waitpid retry
+    # loop inside subprocess. A no-op where pidfd_open is unavailable.
+    def wait_pid_exit(self, pid):
+        if hasattr(os, "pidfd_open"):
+            try:
+                fd = os.pidfd_open(pid)
+                try:
+                    poller = select.poll()
+                    poller.register(fd, select.POLLIN)
+                    poller.poll(self.STUNNEL_EXIT_TIMEOUT_MS)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+    def wait_stunnel_exit(self, proc):
+        self.wait_pid_exit(proc.pid)
+        _, stderr = proc.communicate()
+        return proc.returncode, stderr
+
     def run_stunnel_mount_command(
         self, port, mount_path, ip_address, cleanup_config=False
     ):
@@ -293,6 +466,7 @@ class MountIbmshare(MountHelperBase):
         )
         self.LogDebug(f"Attempting mount of {mount_path} on local host")
         out = self.RunCmd(cmd, "Mount using stunnel ", ret_out=True)
+        self._invalidate_mounts()
         if not out or out.is_error():
             # Removes conf file as well.
             st = StunnelConfigGet()
@@ -330,7 +504,7 @@ class MountIbmshare(MountHelperBase):
                     self.LogError("Use the -o stunnel option. Remove secure=true")
                     return False
 
-                cert = RenewCerts()
+                cert = self._renew()
                 if not cert.root_cert_installed():
                     self.LogError("Root Certificate must be installed.")
                     return False
@@ -357,6 +531,7 @@ class MountIbmshare(MountHelperBase):
 
         self.unlock()
         out = self.RunCmd(args.get_mount_cmd_line(), "MountCmd", ret_out=True)
+        self._invalidate_mounts()
         # When the -v option is used, stdout and stderr may contain additional output.
         if not out or out.is_error():
             if (
@@ -378,7 +553,7 @@ class MountIbmshare(MountHelperBase):
 
     # Check int and root CA certs validity.
     def ca_certs_alert(self):
-        cert = RenewCerts()
+        cert = self._renew()
         if not cert.load_int_ca_certificate():
             return False
         cert.check_ca_certs_validity("Int")
@@ -387,6 +562,28 @@ class MountIbmshare(MountHelperBase):
         cert.check_ca_certs_validity("Root")
         return True
 
+    def run_renew(self):
+        ret = self.renew_certs()
+        self.ca_certs_alert()
+        return ret
+
+    def run_mount(self):
+        args = ArgsHandler.get_mount_args()
+        if not args:
+            return False
+        self.lock()
+        if self.stunnel_requested:
+            self.cleanup_stale_conf()
+            ret = self.process_stunnel_mount(args)
+            if not ret:
+                self.LogError("Stunnel mount failed")
+            else:
+                self.LogDebug("Stunnel mount was successful")
+        else:
+            ret = self.mount(args)
+        self.unlock()
+        return ret
+
     def run(self):
         if not SysApp.is_root():
             return self.LogError(
@@ -396,9 +593,9 @@ class MountIbmshare(MountHelperBase):
         ret = False
         try:
             ArgsHandler.set_logging_level()
-            stunnel_requested = ArgsHandler.is_request_stunnel()
+            self.stunnel_requested = ArgsHandler.is_request_stunnel()
 
-            if stunnel_requested:
+            if self.stunnel_requested:
                 self.lock()
                 ret = self.set_installed_stunnel()
                 self.unlock()
@@ -408,30 +605,9 @@ class MountIbmshare(MountHelperBase):
                 self.set_installed_ipsec()
 
             rt = ArgsHandler.get_app_run_type()
-            if rt.is_setup():
-                ret = self.app_setup()
-            elif rt.is_teardown():
-                ret = self.app_teardown()
-            elif rt.is_renew():
-                ret = self.renew_certs()
-                self.ca_certs_alert()
-            elif rt.is_mount():
-                args = ArgsHandler.get_mount_args()
-                if args:
-                    self.lock()
-                    if stunnel_requested:
-                        self.cleanup_stale_conf()
-                        ret = self.process_stunnel_mount(args)
-                        if not ret:
-                            self.LogError("Stunnel mount failed")
-                        else:
-                            self.LogDebug("Stunnel mount was successful")
-                    else:
-                        ret = self.mount(args)
-                    self.unlock()
+            ret = getattr(self, self.RUN_DISPATCH[rt.value])()
         except Exception as ex:
             self.LogException("AppRun", ex)
-            traceback.print_exc()
             self.unlock()
         return ret
 
@@ -6,10 +6,33 @@
 
 import os
 import re
-from datetime import datetime
+import time
 from stunnel_config_get import StunnelConfigGet
 
 
+# The constant parts of the conf are assembled once at import time;
+# write_file only has to format the per-mount fields into the template.
+_CONF_TEMPLATE = (
+    "########################################################################\n"
+    "# Generated Stunnel config for mounting ibmshare for EIT. Do not edit. #\n"
+    "# Time of creation : {time_of_creation}\n"
+    "########################################################################\n"
+    "\n"
+    "# " + StunnelConfigGet.STUNNEL_IDENTIFIER + " = {remote_path}\n"
+    "pid = {pid_file_name}\n"
+    "log = overwrite\n"
+    "output = {log_file}\n"
+    "debug = 7\n"
+    "[{st_eyecatcher}]\n"
+    "\n"
+    "client = yes\n" + StunnelConfigGet.STUNNEL_ACCEPT + " = {accept_ip}:{accept_port}\n"
+    + StunnelConfigGet.STUNNEL_CONNECT + " = {connect_ip}:{connect_port}\n"
+    "verifyChain = yes\n"
+    "checkHost = {stunnel_env}.is-share.appdomain.cloud\n"
+    "cafile = {ca_file}\n"
+)
+
+
 class StunnelConfigCreate:
     WRITE_ERROR = "The following exception occurred on write to file - "
 
@@ -104,47 +127,45 @@ class StunnelConfigCreate:
         log_file = os.path.join(
             StunnelConfigGet.STUNNEL_LOG_DIR, st_eyecatcher + ".log"
         )
-        buffer = (
-            "########################################################################"
-            "\n"
-            "# Generated Stunnel config for mounting ibmshare for EIT. Do not edit. #"
-            "\n"
-            f"# Time of creation : {datetime.now()}"
-            "\n"
-            "########################################################################"
-            "\n\n"
-            f"# {StunnelConfigGet.STUNNEL_IDENTIFIER} = {self.remote_path}"
-            "\n"
-            f"pid = {pid_file_name}"
-            "\n"
-            "log = overwrite"
-            "\n"
-            f"output = {log_file}"
-            "\n"
-            "debug = 7"
-            "\n"
-            f"[{st_eyecatcher}]"
-            "\n\n"
-            "client = yes"
-            "\n"
-            f"{StunnelConfigGet.STUNNEL_ACCEPT} = {self.accept_ip}:{self.accept_port}"
-            "\n"
-            f"{StunnelConfigGet.STUNNEL_CONNECT} = {self.connect_ip}:{self.connect_port}"
-            "\n"
-            "verifyChain = yes"
-            "\n"
-            f"checkHost = {stunnel_env}.is-share.appdomain.cloud"
-            "\n"
-            f"cafile = {ca_file}"
-            "\n"
+        buffer = _CONF_TEMPLATE.format(
+            # The timestamp is a comment; strftime on gmtime is far cheaper
+            # than building and stringifying a datetime object.
+            time_of_creation=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            remote_path=self.remote_path,
+            pid_file_name=pid_file_name,
+            log_file=log_file,
+            st_eyecatcher=st_eyecatcher,
+            accept_ip=self.accept_ip,
+            accept_port=self.accept_port,
+            connect_ip=self.connect_ip,
+            connect_port=self.connect_port,
+            stunnel_env=stunnel_env,
+            ca_file=ca_file,
         )
         filepath = self.filepath
+        tmp_filepath = filepath + ".tmp"
         try:
-            with open(filepath, "w") as file:
-                file.write(buffer)
+            # One write(2) of pre-encoded bytes on a raw fd: no buffered
+            # text layer or encoding machinery for a one-shot config write.
+            # Written to a temp name and renamed into place so a crash can
+            # never leave a truncated conf for cleanup_stale_conf to parse.
+            fd = os.open(
+                tmp_filepath,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+                0o644,
+            )
+            try:
+                os.write(fd, buffer.encode("utf-8"))
+            finally:
+                os.close(fd)
+            os.rename(tmp_filepath, filepath)
         except Exception as e:
             self.error = f"{StunnelConfigCreate.WRITE_ERROR} '{filepath}': {e}"
             self.valid = False
+            try:
+                os.remove(tmp_filepath)
+            except OSError:
+                pass
             return
         self.valid = True
         return
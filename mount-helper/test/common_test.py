@@ -33,6 +33,26 @@ class TestCommonCode(unittest.TestCase):
         if os.path.exists(tst.LOG_FILE):
             os.remove(tst.LOG_FILE)
 
+    def test_log_batching(self):
+        tst = MountHelperLogger()
+        tst.SetLogToFileEnabled()
+        log = tst.LOG_FILE
+        tst.EnableLogBatching()
+        tst.LogInfo("batched info")
+        tst.DisableLogBatching()
+        tst.LogInfo("after batching")
+
+        self.assertTrue(file_contains(log, "batched info"))
+        self.assertTrue(file_contains(log, "after batching"))
+        self.assertIsNone(MountHelperLogger.batch_handler)
+        # Detach the file handler so other tests reinit the log file.
+        for handler in list(MountHelperLogger.log_file.handlers):
+            MountHelperLogger.log_file.removeHandler(handler)
+            handler.close()
+        MountHelperLogger.log_file = None
+        if os.path.exists(tst.LOG_FILE):
+            os.remove(tst.LOG_FILE)
+
     def test_subprocess_run(self):
         cmd = ["ls", "/tmp"]
         proc = SubProcess(cmd)
@@ -134,8 +134,11 @@ class TestMountIbmshare(unittest.TestCase):
             out_file.write(buffer)
         return config_filename
 
+    # pidfd_open is forced to fail so the kill deterministically takes
+    # the os.kill fallback that this test counts.
+    @mock.patch("os.pidfd_open", side_effect=OSError, create=True)
     @mock.patch("os.kill")
-    def test_kill_pid(self, os_kill_pid):
+    def test_kill_pid(self, os_kill_pid, os_pidfd_open):
 
         counter = 0
         for pid in ["999999", "88888", "100000"]:
@@ -200,17 +203,20 @@ class TestMountIbmshare(unittest.TestCase):
     def fake_get_trusted_ca_file(self):
         return "/dev/null"
 
-    @mock.patch("subprocess.run")
+    # Force the Popen fallback so the mocked handle is what gets used.
+    @mock.patch("mount_ibmshare._HAS_POSIX_SPAWN", False)
+    @mock.patch("subprocess.Popen")
     def test_start_stunnel(self, subprocess_handle):
         with patch.object(
             StunnelConfigCreate,
             "get_trusted_ca_file",
             new=self.fake_get_trusted_ca_file,
         ):
-            subprocess_handle.return_value.returncode = 0
-            subprocess_handle.return_value = subprocess.CompletedProcess(
-                args=["dummy", "dummy"], returncode=0
-            )
+            proc = subprocess_handle.return_value
+            # A pid that cannot exist so the pidfd wait falls back cleanly.
+            proc.pid = 999999999
+            proc.returncode = 0
+            proc.communicate.return_value = (None, b"")
             mis = mount_ibmshare.MountIbmshare()
             ret = mis.start_stunnel(10001, "10.10.1.1", "/C0FFEE")
             self.assertEqual(ret, True)
@@ -221,17 +227,27 @@ class TestMountIbmshare(unittest.TestCase):
                 subprocess_handle.call_args[0][0][1],
             )
 
-            subprocess_handle.return_value = subprocess.CompletedProcess(
-                args=["stunnel", "This_is_an_Incorrect_file_name.conf"],
-                returncode=99,
-                stdout="",
-                stderr="This error was intentionally simulated in a unit test".encode(
+            proc.returncode = 99
+            proc.communicate.return_value = (
+                None,
+                "This error was intentionally simulated in a unit test".encode(
                     "utf-8"
                 ),
             )
             ret = mis.start_stunnel(10001, "10.10.1.1", "/C0FFEE")
             self.assertEqual(ret, False)
 
+    # Exercise the real spawn path with stand-in commands.
+    def test_launch_stunnel(self):
+        mis = mount_ibmshare.MountIbmshare()
+        with patch.object(mount_ibmshare, "STUNNEL_COMMAND", "true"):
+            returncode, stderr = mis.launch_stunnel("ignored.conf")
+            self.assertEqual(returncode, 0)
+            self.assertEqual(stderr, b"")
+        with patch.object(mount_ibmshare, "STUNNEL_COMMAND", "false"):
+            returncode, _ = mis.launch_stunnel("ignored.conf")
+            self.assertNotEqual(returncode, 0)
+
     def setup_mocks(self, mis, is_share_mounted=False):
 
         mis.start_stunnel = MagicMock(return_value=True)
@@ -49,16 +49,22 @@ def init_ocert(
 
 
 def do_already_mounted(ret=0, data="", ip="", path=""):
+    # Mount enumeration reads the proc mounts file directly; point it at a
+    # temp file, or at a missing one to exercise the command fallback.
     mo = mount_ibmshare.MountIbmshare()
-    with MySubProcess(ret, data) as run:
-        ret = mo.is_share_mounted(ip, path)
-    return mo, ret
+    proc_file = test_folder.get_temp_filename(".mounts")
+    if data:
+        write_file(proc_file, data)
+    with mock.patch.object(NfsMount, "PROC_MOUNTS_PATH", proc_file):
+        with MySubProcess(ret, "") as run:
+            out = mo.is_share_mounted(ip, path)
+    return mo, out
 
 
 class TestMountIbmshareOther(unittest.TestCase):
 
     def test_load_mounted_shares_returns_one_mount(self):
-        data = "1.1.1.1:mount_path unknown mounted_at ccc nfs"
+        data = "1.1.1.1:mount_path mounted_at nfs rw,relatime 0 0"
         mo, ret = do_already_mounted(data=data)
         self.assertFalse(ret)
         self.assertEqual(len(mo.mounts), 1)
@@ -73,7 +79,7 @@ class TestMountIbmshareOther(unittest.TestCase):
         self.assertEqual(mo.mounts, [])
 
     def test_is_share_mounted(self):
-        data = "1.1.1.1:already_mounted unknown mounted_at ccc nfs"
+        data = "1.1.1.1:already_mounted mounted_at nfs rw,relatime 0 0"
         mo, ret = do_already_mounted(data=data, ip="1.1.1.1", path="already_mounted")
         self.assertTrue(ret)
 
@@ -102,7 +108,7 @@ class TestMountIbmshareOther(unittest.TestCase):
 @mock.patch(
     "sys.argv", ["app", "192.168.56.1:/testshare", "/media/test", "-o secure=true"]
 )
-@mock.patch("mount_ibmshare.RenewCerts")
+@mock.patch("renew_certs.RenewCerts")
 class TestMountIbmshare(unittest.TestCase):
 
     def test_mount_with_new_cert_got_ok(self, ocert):
@@ -164,15 +170,20 @@ class TestMountIbmshare(unittest.TestCase):
 
     @mock.patch("os.path.isdir")
     def test_set_installed_stunnel(self, is_dir_handle, ignore_ocert):
+        # The directory check is memoized; clear it so each scenario
+        # re-evaluates the mocked isdir.
+        mount_ibmshare._missing_stunnel_dirs.cache_clear()
         is_dir_handle.return_value = False
         mo = mount_ibmshare.MountIbmshare()
         ret = mo.set_installed_stunnel()
         self.assertEqual(ret, False)
 
+        mount_ibmshare._missing_stunnel_dirs.cache_clear()
         is_dir_handle.return_value = True
         mo = mount_ibmshare.MountIbmshare()
         ret = mo.set_installed_stunnel()
         self.assertEqual(ret, True)
+        mount_ibmshare._missing_stunnel_dirs.cache_clear()
 
     def test_strong_swan_config_cleanup(self, ocert):
         o = init_ocert(ocert, cleanup_config=False)